@@ -0,0 +1,94 @@
+# ml/adaptive_forest.py
+# Early-exit inference for the crop RandomForest pipeline (crop_rf_pipeline.joblib).
+# Trees are evaluated in blocks; a row stops as soon as the margin between its
+# top two classes is significantly above zero at the requested confidence.
+from statistics import NormalDist
+import numpy as np
+
+DEFAULT_BLOCK = 25
+DEFAULT_CONFIDENCE = 0.99
+
+def split_pipeline(pipe):
+    """Return (preprocess, forest) from the train_model.py pipeline."""
+    return pipe.named_steps["preprocess"], pipe.named_steps["clf"]
+
+def predict_proba_adaptive(pipe, X, confidence=DEFAULT_CONFIDENCE,
+                           block_size=DEFAULT_BLOCK, min_trees=None):
+    """
+    Average tree probabilities block by block and stop early per row.
+
+    A row is settled when the one-sided z-test on the per-tree difference
+    p(top1) - p(top2) passes at `confidence`, which must be in (0, 1). The
+    test's variance is floored (see below), so even unanimous trees need
+    more of them as `confidence` rises. `min_trees` defaults to one block.
+    Returns (proba, trees_used) as numpy arrays of shape (n, n_classes) and (n,).
+    """
+    if not 0 < confidence < 1:
+        raise ValueError(f"confidence must be between 0 and 1 (exclusive), got {confidence}")
+    pre, rf = split_pipeline(pipe)
+    trees = rf.estimators_
+    n_total = len(trees)
+    block_size = max(1, int(block_size))
+    min_trees = block_size if min_trees is None else max(1, int(min_trees))
+    z_crit = NormalDist().inv_cdf(confidence)
+
+    Xt = np.asarray(pre.transform(X), dtype=np.float32)
+    n = Xt.shape[0]
+    n_classes = len(rf.classes_)
+
+    sums = np.zeros((n, n_classes))
+    used = np.zeros(n, dtype=int)
+    active = np.arange(n)
+    per_tree = []  # (rows, [per-tree probabilities]) for every block evaluated
+
+    for start in range(0, n_total, block_size):
+        if active.size == 0:
+            break
+        block = trees[start:start + block_size]
+        Xa = Xt[active]
+        per_tree.append((active, [t.predict_proba(Xa) for t in block]))
+        for p in per_tree[-1][1]:
+            sums[active] += p
+        used[active] += len(block)
+
+        if used[active[0]] < min_trees or start + block_size >= n_total:
+            continue
+
+        # Gather every tree's probabilities for the active rows so far
+        stacked = _stack_history(per_tree, active, n_classes)
+        mean = sums[active] / used[active][:, None]
+        order = np.argsort(mean, axis=1)
+        top1, top2 = order[:, -1], order[:, -2]
+        rows = np.arange(active.size)
+        diffs = stacked[:, rows, top1] - stacked[:, rows, top2]  # (trees, rows)
+        k = diffs.shape[0]
+        d_mean = diffs.mean(axis=0)
+        d_var = diffs.var(axis=0, ddof=1) if k > 1 else np.zeros_like(d_mean)
+        # Floor the variance at that of the margin read as a Bernoulli vote,
+        # p = (1 + d) / 2, with z_crit**2 / 2 pseudo-votes on each side (the
+        # Agresti-Coull / Wilson centre). Unanimous trees would otherwise give
+        # se == 0 and z == inf, settling the row at min_trees whatever the
+        # confidence; with the floor they need about z_crit**2 trees.
+        p = ((1 + diffs).sum(axis=0) / 2 + z_crit ** 2 / 2) / (k + z_crit ** 2)
+        se = np.sqrt(np.maximum(d_var, 4 * p * (1 - p)) / k)
+        z = d_mean / se
+        active = active[z < z_crit]
+
+    proba = sums / used[:, None]
+    return proba, used
+
+def _stack_history(per_tree, active, n_classes):
+    """Collect (trees, len(active), n_classes) probabilities for the given rows."""
+    out = []
+    for rows, probs in per_tree:
+        # rows is a superset of active (rows only ever drop out)
+        pos = np.searchsorted(rows, active)
+        out.extend(p[pos] for p in probs)
+    return np.stack(out) if out else np.zeros((0, active.size, n_classes))
+
+def predict_adaptive(pipe, X, confidence=DEFAULT_CONFIDENCE, block_size=DEFAULT_BLOCK,
+                     min_trees=None):
+    """Return (labels, proba, trees_used) for X using early-exit inference."""
+    proba, used = predict_proba_adaptive(pipe, X, confidence, block_size, min_trees)
+    classes = split_pipeline(pipe)[1].classes_
+    return classes[proba.argmax(axis=1)], proba, used
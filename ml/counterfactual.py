@@ -0,0 +1,115 @@
+# ml/counterfactual.py
+# "What to change" search for process evaluations that come back not suitable.
+# For every farmer we build a grid of adjusted readings that only touch the
+# controllable features, score all farmers' candidates in ONE predict_proba call,
+# and keep the cheapest change set whose score crosses the threshold.
+import sys, json, argparse, itertools
+import numpy as np
+import pandas as pd
+import joblib
+from stage_rules import find_stage, GENERIC_RANGES
+
+FEATURES = ["N","P","K","temperature","humidity","ph","rainfall"]
+# Rainfall stands for water supplied; irrigation can add water but not remove it.
+CONTROLLABLE = ["N","P","K","ph","rainfall"]
+INCREASE_ONLY = {"rainfall"}
+
+def target_ranges(rules, crop, stage):
+    st = find_stage(rules, crop, stage)
+    if st and "ideal_ranges" in st:
+        return st["ideal_ranges"]
+    return GENERIC_RANGES
+
+def candidate_values(v, rr, steps, increase_only=False):
+    """Current value, the nearest in-range value and `steps` points across the range."""
+    lo, hi = sorted((float(rr["min"]), float(rr["max"])))
+    opts = {float(v), float(np.clip(v, lo, hi))}
+    opts.update(np.linspace(lo, hi, steps).tolist() if steps > 1 else [(lo + hi) / 2])
+    if increase_only:
+        opts = {o for o in opts if o >= v}
+    return sorted(opts)
+
+def build_candidates(row, ranges, steps):
+    """Return (candidates DataFrame, cost array, changed-feature mask) for one farmer."""
+    options, widths = [], []
+    for k in CONTROLLABLE:
+        rr = ranges[k]
+        options.append(candidate_values(row[k], rr, steps, k in INCREASE_ONLY))
+        widths.append(max(abs(float(rr["max"]) - float(rr["min"])), 1e-6))
+
+    grid = np.array(list(itertools.product(*options)), dtype=float)
+    current = np.array([row[k] for k in CONTROLLABLE], dtype=float)
+    delta = np.abs(grid - current)
+    changed = delta > 1e-9
+    # Cost = range-normalised size of the changes, plus a small charge per input touched
+    cost = (delta / np.array(widths)).sum(axis=1) + 0.01 * changed.sum(axis=1)
+
+    cand = pd.DataFrame(grid, columns=CONTROLLABLE)
+    for k in FEATURES:
+        if k not in CONTROLLABLE:
+            cand[k] = row[k]
+    cand["crop"] = row["crop"]
+    cand["stage"] = row["stage"]
+    return cand, cost, changed
+
+def counterfactuals(pipe, rules, rows, threshold, steps=3):
+    """
+    rows: list of dicts with crop, stage and the 7 readings.
+    Returns one result dict per row, in order.
+    """
+    built = [build_candidates(r, target_ranges(rules, r["crop"], r["stage"]), steps) for r in rows]
+    if not built:
+        return []
+    X = pd.concat([b[0] for b in built], ignore_index=True)
+    proba = pipe.predict_proba(X)[:, 1]  # single model call for every farmer
+
+    results, start = [], 0
+    for row, (cand, cost, changed) in zip(rows, built):
+        p = proba[start:start + len(cand)]
+        start += len(cand)
+        ok = np.flatnonzero(p >= threshold)
+        found = ok.size > 0
+        if found:
+            # cheapest passing candidate; ties go to the higher score
+            best = ok[np.lexsort((-p[ok], cost[ok]))[0]]
+        else:
+            # highest score; ties go to the cheaper change. Keep the current reading
+            # (no changes) unless some candidate actually scores better.
+            best = np.lexsort((cost, -p))[0]
+            current = np.flatnonzero(~changed.any(axis=1))[0]
+            if p[best] <= p[current]:
+                best = current
+        changes = [
+            {"feature": k, "from": row[k], "to": round(float(cand[k].iloc[best]), 2)}
+            for j, k in enumerate(CONTROLLABLE) if changed[best, j]
+        ]
+        results.append({
+            "found": bool(found),
+            "suitability_score": round(float(p[best]), 3),
+            "cost": round(float(cost[best]), 3),
+            "changes": changes,
+            "candidates": len(cand),
+        })
+    return results
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Batch counterfactuals; reads a JSON list of rows "
+                                             "(crop, stage, N, P, K, temperature, humidity, ph, rainfall)")
+    ap.add_argument("input", nargs="?", default="-", help="JSON file, or - for stdin")
+    ap.add_argument("--rules", default="all_crops_stage_guide.json")
+    ap.add_argument("--model", default="process_eval_pipeline.joblib")
+    ap.add_argument("--threshold", type=float, default=0.4)
+    ap.add_argument("--steps", type=int, default=3)
+    args = ap.parse_args()
+
+    if args.input == "-":
+        rows = json.load(sys.stdin)
+    else:
+        with open(args.input, "r", encoding="utf-8") as f:
+            rows = json.load(f)
+
+    pipe = joblib.load(args.model)
+    with open(args.rules, "r", encoding="utf-8") as f:
+        rules = json.load(f)
+
+    print(json.dumps(counterfactuals(pipe, rules, rows, args.threshold, args.steps)))
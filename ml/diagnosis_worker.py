@@ -0,0 +1,140 @@
+# ml/diagnosis_worker.py
+# Worker pool that drains the diagnosis job queue (job_queue.py).
+# Each pool process imports diagnosis.py (Gemini client) once and reuses it,
+# instead of paying a process spawn + import per HTTP request.
+#
+#   python diagnosis_worker.py --concurrency 4
+#
+# server.js only queues jobs, so this must be started alongside it (one per
+# queue: a second worker on the same --db exits, see acquire_worker_lock).
+import sys, json, time, argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from job_queue import JobQueue, DEFAULT_DB, UPLOAD_DIR, worker_lock_path, try_lock, unlock
+
+def run_diagnosis(image_path):
+    # Imported inside the pool process so the Gemini client is configured once per worker
+    import diagnosis
+    return diagnosis.get_disease_diagnosis(image_path)
+
+def remove_upload(image_path):
+    try:
+        Path(image_path).unlink()
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"worker: could not remove {image_path}: {e}", file=sys.stderr)
+
+def finish(q, args, job, payload, result, error):
+    if error:
+        state = q.fail(job["id"], error)
+        print(f"worker: job {job['id']} attempt {job['attempts'] + 1} failed ({state}): {error}",
+              file=sys.stderr)
+    else:
+        q.complete(job["id"], result)
+        state = "done"
+    if state != "queued" and not args.keep_uploads:
+        remove_upload(payload["image_path"])
+
+def acquire_worker_lock(db, tries=20):
+    # server.js probes the lock (worker_alive) for a moment on every poll, so retry briefly
+    for _ in range(tries):
+        lock = try_lock(worker_lock_path(db))
+        if lock is not None:
+            return lock
+        time.sleep(0.1)
+    return None
+
+def serve(args):
+    lock = acquire_worker_lock(args.db)
+    if lock is None:
+        print(f"worker: another diagnosis_worker.py is already serving {args.db}", file=sys.stderr)
+        sys.exit(1)
+    q = JobQueue(args.db, retry_delay=args.retry_delay)
+    # We hold the queue's worker lock, so anything still "running" was orphaned
+    requeued, failed = q.requeue_stale(0)
+    if requeued or failed:
+        print(f"worker: requeued {requeued}, failed {failed} interrupted job(s)", file=sys.stderr)
+
+    in_flight = {}  # future -> (job row, payload)
+    last_cleanup = last_stats = 0.0
+    pool = ProcessPoolExecutor(max_workers=args.concurrency)
+    try:
+        while True:
+            broken = False
+            # Fill free slots up to the concurrency cap
+            while len(in_flight) < args.concurrency:
+                job = q.claim()
+                if job is None:
+                    break
+                payload = json.loads(job["payload"])
+                try:
+                    fut = pool.submit(run_diagnosis, payload["image_path"])
+                except BrokenProcessPool:
+                    q.release(job["id"])
+                    broken = True
+                    break
+                in_flight[fut] = (job, payload)
+
+            if in_flight and not broken:
+                done, _ = wait(in_flight, timeout=args.poll, return_when=FIRST_COMPLETED)
+            else:
+                done = set()
+                if not broken:
+                    time.sleep(args.poll)
+
+            for fut in done:
+                job, payload = in_flight.pop(fut)
+                try:
+                    result = fut.result()
+                    error = result.get("error")
+                except BrokenProcessPool as e:
+                    broken = True
+                    result, error = None, f"❌ Worker process died: {e!r}"
+                except BaseException as e:
+                    result, error = None, f"❌ Worker failed: {e!r}"
+                finish(q, args, job, payload, result, error)
+
+            if broken:
+                # A pool process died (native crash, OOM kill). Every job that was in
+                # the dead pool is charged an attempt, so a job that keeps crashing the
+                # worker ends up failed after max_attempts.
+                for fut, (job, payload) in in_flight.items():
+                    if fut.done() and not fut.cancelled() and fut.exception() is None:
+                        result = fut.result()
+                        finish(q, args, job, payload, result, result.get("error"))
+                    else:
+                        finish(q, args, job, payload, None, "❌ Worker process died")
+                in_flight.clear()
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = ProcessPoolExecutor(max_workers=args.concurrency)
+                print("worker: process pool broke; restarted it", file=sys.stderr)
+
+            now = time.time()
+            if now - last_cleanup >= args.cleanup_every:
+                q.cleanup_uploads(args.uploads, args.upload_max_age)
+                last_cleanup = now
+            if args.stats_every and now - last_stats >= args.stats_every:
+                print(json.dumps({"queue": q.stats()}), file=sys.stderr)
+                last_stats = now
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        unlock(lock)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--db", default=str(DEFAULT_DB))
+    ap.add_argument("--concurrency", type=int, default=2)
+    ap.add_argument("--poll", type=float, default=0.5, help="seconds between queue checks")
+    ap.add_argument("--retry-delay", type=float, default=5.0, help="backoff per failed attempt (s)")
+    ap.add_argument("--uploads", default=str(UPLOAD_DIR))
+    ap.add_argument("--upload-max-age", type=float, default=3600)
+    ap.add_argument("--cleanup-every", type=float, default=600)
+    ap.add_argument("--stats-every", type=float, default=60, help="log queue metrics; 0 disables")
+    ap.add_argument("--keep-uploads", action="store_true")
+    args = ap.parse_args()
+    try:
+        serve(args)
+    except KeyboardInterrupt:
+        pass
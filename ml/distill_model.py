@@ -0,0 +1,196 @@
+# ml/distill_model.py
+# Distil the 250-tree crop forest (crop_rf_pipeline.joblib) into a compact student
+# for the USSD / low-end path. The student is fit on the teacher's predict_proba
+# over dense synthetic readings drawn inside the crop ranges of
+# all_crops_stage_guide.json and saved as a float32/int8 .npz for edge_predict.py.
+import json, argparse, time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import joblib
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.tree import DecisionTreeRegressor
+from edge_predict import EdgeModel, COLS
+
+rng = np.random.default_rng(42)
+
+def crop_ranges(rules):
+    """Yield every (crop, ranges) block in the guide: base ranges plus each stage."""
+    for crop, c in rules.get("crops", {}).items():
+        if "base_ranges" in c:
+            yield crop, c["base_ranges"]
+        for st in c.get("stages", []):
+            if "ideal_ranges" in st:
+                yield crop, st["ideal_ranges"]
+
+def sample_synthetic(rules, per_block, spread):
+    """Uniform samples inside each range block, widened by `spread` of its width."""
+    parts = []
+    for _, ranges in crop_ranges(rules):
+        cols = []
+        for k in COLS:
+            lo, hi = sorted((float(ranges[k]["min"]), float(ranges[k]["max"])))
+            pad = max(hi - lo, 1e-3) * spread
+            lo, hi = lo - pad, hi + pad
+            if k in ("N", "P", "K", "rainfall", "humidity"):
+                lo = max(lo, 0.0)
+            cols.append(rng.uniform(lo, hi, size=per_block))
+        parts.append(np.column_stack(cols))
+    return np.vstack(parts).astype(np.float32)
+
+def teacher_proba(pipe, X):
+    return pipe.predict_proba(pd.DataFrame(X, columns=COLS))
+
+# ---------- Students ----------
+def fit_forest(X, P, n_trees, max_depth, min_leaf):
+    if n_trees == 1:
+        est = DecisionTreeRegressor(max_depth=max_depth, min_samples_leaf=min_leaf, random_state=42)
+        est.fit(X, P)
+        return [est]
+    est = RandomForestRegressor(n_estimators=n_trees, max_depth=max_depth,
+                                min_samples_leaf=min_leaf, n_jobs=-1, random_state=42)
+    est.fit(X, P)
+    return est.estimators_
+
+def export_forest(trees, classes):
+    """Flatten sklearn trees into the int8/float32 arrays read by EdgeModel."""
+    feature, threshold, left, right, roots, values = [], [], [], [], [], []
+    offset = 0
+    for est in trees:
+        t = est.tree_
+        roots.append(offset)
+        is_leaf = t.children_left == -1
+        leaf_rows = np.cumsum(is_leaf) - 1 + sum(len(v) for v in values)
+        feature.append(np.where(is_leaf, -1, t.feature))
+        threshold.append(np.where(is_leaf, 0, t.threshold))
+        left.append(np.where(is_leaf, leaf_rows, t.children_left + offset))
+        right.append(np.where(is_leaf, -1, t.children_right + offset))
+        v = t.value[is_leaf][:, :, 0]
+        v = v / np.clip(v.sum(axis=1, keepdims=True), 1e-9, None)
+        values.append(np.rint(v * 127))
+        offset += t.node_count
+    return {
+        "kind": np.array("forest"),
+        "classes": np.asarray(classes, dtype=str),
+        "feature": np.concatenate(feature).astype(np.int8),
+        "threshold": np.concatenate(threshold).astype(np.float32),
+        "left": np.concatenate(left).astype(np.int32),
+        "right": np.concatenate(right).astype(np.int32),
+        "roots": np.asarray(roots, dtype=np.int32),
+        "value": np.concatenate(values).astype(np.int8),
+    }
+
+def fit_grid(pipe, X, P, bins, classes):
+    """
+    Quantised lookup grid: per-feature quantile bins; each cell takes the argmax
+    of the mean teacher probability of the samples that fall in it, or the
+    teacher's answer at the cell's bin medians if no sample landed there.
+    """
+    edges = np.stack([np.quantile(X[:, j], np.linspace(0, 1, bins + 1)[1:-1])
+                      for j in range(len(COLS))]).astype(np.float32)
+    bin_idx = np.stack([np.searchsorted(edges[j], X[:, j], side="right")
+                        for j in range(len(COLS))], axis=1)
+    cell = np.ravel_multi_index(bin_idx.T, (bins,) * len(COLS))
+
+    n_cells = bins ** len(COLS)
+    sums = np.zeros((n_cells, P.shape[1]))
+    np.add.at(sums, cell, P)
+    table = sums.argmax(axis=1)
+
+    empty = np.flatnonzero(sums.sum(axis=1) == 0)
+    if empty.size:
+        medians = [[np.median(X[bin_idx[:, j] == b, j]) if (bin_idx[:, j] == b).any() else 0.0
+                    for b in range(bins)] for j in range(len(COLS))]
+        grid_bins = np.stack(np.unravel_index(empty, (bins,) * len(COLS)), axis=1)
+        reps = np.array([[medians[j][b] for j, b in enumerate(r)] for r in grid_bins])
+        table[empty] = teacher_proba(pipe, reps).argmax(axis=1)
+
+    return {
+        "kind": np.array("grid"),
+        "classes": np.asarray(classes, dtype=str),
+        "edges": edges,
+        "table": table.astype(np.int8),
+    }
+
+# ---------- Report ----------
+def latency(fn, X, rows=200):
+    """(median single-row seconds, batch seconds per row)."""
+    singles = []
+    for i in range(min(rows, len(X))):
+        t0 = time.perf_counter()
+        fn(X[i:i + 1])
+        singles.append(time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    fn(X)
+    return float(np.median(singles)), (time.perf_counter() - t0) / len(X)
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--teacher", default="crop_rf_pipeline.joblib")
+    p.add_argument("--rules", default="all_crops_stage_guide.json")
+    p.add_argument("--csv", default="Crop_recommendation.csv")
+    p.add_argument("--out", default="crop_edge_model.npz")
+    p.add_argument("--student", choices=["tree", "forest", "grid"], default="forest")
+    p.add_argument("--samples", type=int, default=400, help="synthetic samples per range block")
+    p.add_argument("--spread", type=float, default=0.1)
+    p.add_argument("--trees", type=int, default=8)
+    p.add_argument("--depth", type=int, default=10)
+    p.add_argument("--min-leaf", type=int, default=3)
+    p.add_argument("--bins", type=int, default=6)
+    p.add_argument("--target-ms", type=float, default=1.0, help="per-request latency target")
+    args = p.parse_args()
+
+    pipe = joblib.load(args.teacher)
+    classes = pipe.named_steps["clf"].classes_
+    with open(args.rules, "r", encoding="utf-8") as f:
+        rules = json.load(f)
+
+    X = sample_synthetic(rules, args.samples, args.spread)
+    P = teacher_proba(pipe, X)
+    n_hold = len(X) // 5
+    perm = rng.permutation(len(X))
+    hold, train = perm[:n_hold], perm[n_hold:]
+
+    if args.student == "grid":
+        artifact = fit_grid(pipe, X[train], P[train], args.bins, classes)
+    else:
+        n_trees = 1 if args.student == "tree" else args.trees
+        trees = fit_forest(X[train], P[train], n_trees, args.depth, args.min_leaf)
+        artifact = export_forest(trees, classes)
+
+    np.savez_compressed(args.out, **artifact)
+    student = EdgeModel(args.out)
+
+    df = pd.read_csv(args.csv)
+    X_csv = df[COLS].to_numpy(dtype=np.float32)
+    teacher_fn = lambda A: pipe.predict(pd.DataFrame(A, columns=COLS))
+    report = {
+        "student": args.student,
+        "artifact": str(Path(args.out).resolve()),
+        "size_bytes": Path(args.out).stat().st_size,
+        "teacher_size_bytes": Path(args.teacher).stat().st_size,
+        "synthetic_samples": len(X),
+        "agreement_holdout": float((student.predict(X[hold]) == classes[P[hold].argmax(axis=1)]).mean()),
+        "agreement_csv": float((student.predict(X_csv) == teacher_fn(X_csv)).mean()),
+        "accuracy_csv": float((student.predict(X_csv) == df["label"].to_numpy()).mean()),
+    }
+    t_single, t_batch = latency(teacher_fn, X_csv)
+    s_single, s_batch = latency(student.predict, X_csv)
+    report.update({
+        "teacher_ms_per_request": round(t_single * 1000, 4),
+        "student_ms_per_request": round(s_single * 1000, 4),
+        "teacher_us_per_row_batch": round(t_batch * 1e6, 3),
+        "student_us_per_row_batch": round(s_batch * 1e6, 3),
+        "target_ms_per_request": args.target_ms,
+        "meets_latency_target": s_single * 1000 <= args.target_ms,
+    })
+
+    for k, v in report.items():
+        print(f"{k}: {v}")
+    report_path = Path(args.out).with_suffix(".report.json")
+    report_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print("Saved model to:", Path(args.out).resolve())
+    print("Saved report to:", report_path.resolve())
+    if not report["meets_latency_target"]:
+        print(f"WARNING: student takes {report['student_ms_per_request']} ms per request, "
+              f"above the {args.target_ms} ms target; try --student tree/grid or fewer --trees")
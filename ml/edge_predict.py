@@ -0,0 +1,109 @@
+# ml/edge_predict.py
+# Minimal evaluator for the distilled crop model (crop_edge_model.npz) produced by
+# distill_model.py. Needs only numpy, so it can run on the USSD / low-end path.
+#
+# Artifact layout:
+#   kind      "forest" or "grid"
+#   classes   crop labels (unicode array)
+#   forest:   feature int8 (-1 = leaf), threshold float32, left/right int32,
+#             roots int32 (one per tree), value int8 (leaf probs * 127);
+#             for leaves, left[node] is the row into value
+#   grid:     edges float32 (7, bins-1), table int8 (bins ** 7) -> class index
+import sys, json
+from pathlib import Path
+import numpy as np
+
+COLS = ["N","P","K","temperature","humidity","ph","rainfall"]
+
+class EdgeModel:
+    def __init__(self, path):
+        with np.load(path) as z:
+            self.arrays = {k: z[k] for k in z.files}
+        self.kind = str(self.arrays["kind"])
+        self.classes = self.arrays["classes"]
+        if self.kind == "forest":
+            # Plain-list copy of the tree arrays for the single-row (per-request) path
+            a = self.arrays
+            self._lists = (a["feature"].tolist(), a["threshold"].tolist(),
+                           a["left"].tolist(), a["right"].tolist(), a["roots"].tolist())
+
+    def predict_proba(self, X):
+        """X: (n, 7) readings in COLS order. Returns (n, n_classes) float32."""
+        X = np.asarray(X, dtype=np.float32).reshape(-1, len(COLS))
+        if self.kind == "grid":
+            return self._grid(X)
+        if X.shape[0] == 1:
+            return self._forest_one(X[0].tolist())
+        return self._forest(X)
+
+    def predict(self, X):
+        return self.classes[self.predict_proba(X).argmax(axis=1)]
+
+    def _forest_one(self, x):
+        """Scalar traversal for one row; avoids numpy per-level overhead."""
+        feature, threshold, left, right, roots = self._lists
+        leaves = []
+        for node in roots:
+            f = feature[node]
+            while f >= 0:
+                node = left[node] if x[f] <= threshold[node] else right[node]
+                f = feature[node]
+            leaves.append(left[node])
+        out = self.arrays["value"][leaves].sum(axis=0, dtype=np.float32)
+        return (out / (127.0 * len(roots)))[None, :]
+
+    def _forest(self, X):
+        a = self.arrays
+        feature, threshold = a["feature"], a["threshold"]
+        left, right, value = a["left"], a["right"], a["value"]
+        rows = np.arange(X.shape[0])
+        out = np.zeros((X.shape[0], value.shape[1]), dtype=np.float32)
+        for root in a["roots"]:
+            node = np.full(X.shape[0], root, dtype=np.int32)
+            f = feature[node]
+            while (f >= 0).any():
+                inner = f >= 0
+                go_left = X[rows, np.where(inner, f, 0)] <= threshold[node]
+                node = np.where(inner, np.where(go_left, left[node], right[node]), node)
+                f = feature[node]
+            out += value[left[node]]
+        return out / (127.0 * len(a["roots"]))
+
+    def _grid(self, X):
+        edges, table = self.arrays["edges"], self.arrays["table"]
+        bins = edges.shape[1] + 1
+        idx = np.zeros(X.shape[0], dtype=np.int64)
+        for j in range(len(COLS)):
+            idx = idx * bins + np.searchsorted(edges[j], X[:, j], side="right")
+        out = np.zeros((X.shape[0], len(self.classes)), dtype=np.float32)
+        out[np.arange(X.shape[0]), table[idx]] = 1.0
+        return out
+
+def main():
+    args = sys.argv[1:]
+    model_path = Path(__file__).with_name("crop_edge_model.npz")
+    if "--model" in args:
+        i = args.index("--model")
+        model_path = Path(args[i + 1])
+        del args[i:i + 2]
+    if len(args) != 7:
+        print(json.dumps({"error": "usage: edge_predict.py N P K temperature humidity ph rainfall [--model path]"}))
+        return
+    if not model_path.exists():
+        print(json.dumps({"error": f"model not found at {model_path}"}))
+        return
+
+    model = EdgeModel(model_path)
+    probs = model.predict_proba([list(map(float, args))])[0]
+    order = [i for i in probs.argsort()[::-1] if probs[i] > 0][:3] or [int(probs.argmax())]
+    top3 = [str(model.classes[i]) for i in order]
+    pred = top3[0]
+
+    print(json.dumps({
+        "prediction": pred,
+        "message": f"The most suitable crop is {pred}",
+        "alternatives": top3[1:]
+    }))
+
+if __name__ == "__main__":
+    main()
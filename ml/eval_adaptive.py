@@ -0,0 +1,85 @@
+# ml/eval_adaptive.py
+# Compare early-exit inference (adaptive_forest.py) with the full 250-tree forest:
+# label agreement, accuracy, trees used, and latency. Rows come in three sets:
+#   train     - the rows crop_rf_pipeline.joblib was fitted on
+#   holdout   - train_model.py's 20% test split (same seed), never seen in training
+#   perturbed - holdout rows plus Gaussian noise (--noise x each feature's std),
+#               which pushes rows towards class boundaries where trees disagree
+import argparse, time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import joblib
+from sklearn.model_selection import train_test_split
+from adaptive_forest import predict_adaptive, DEFAULT_BLOCK
+
+COLS = ["N","P","K","temperature","humidity","ph","rainfall"]
+
+def per_row_latency(fn, X, n):
+    """Median seconds per single-row call over the first n rows (request-style)."""
+    times = []
+    for i in range(min(n, len(X))):
+        row = X.iloc[[i]]
+        t0 = time.perf_counter()
+        fn(row)
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times)) if times else 0.0
+
+def split_like_training(df):
+    """(train, holdout) exactly as train_model.py splits Crop_recommendation.csv."""
+    X, y = df[COLS], df["label"]
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=y)
+    return (X_train, y_train), (X_test, y_test)
+
+def perturb(X, scale, seed=0):
+    rng = np.random.default_rng(seed)
+    noise = rng.normal(size=X.shape) * X.std().to_numpy() * scale
+    return (X + noise).clip(lower=0)  # readings are non-negative
+
+def evaluate(pipe, name, X, y, args):
+    t0 = time.perf_counter()
+    full = pipe.predict(X)
+    full_batch = time.perf_counter() - t0
+    full_row = per_row_latency(pipe.predict, X, args.rows)
+
+    print(f"\n[{name}] rows: {len(X)}  full forest: accuracy {float((full == y).mean()):.4f}, "
+          f"batch {full_batch*1000:.1f} ms, per request {full_row*1000:.2f} ms")
+    print(f"{'conf':>7} {'agree':>8} {'accuracy':>9} {'mean trees':>11} {'p95 trees':>10} "
+          f"{'batch ms':>9} {'req ms':>8} {'saved':>7}")
+    for conf in args.confidence:
+        run = lambda D: predict_adaptive(pipe, D, confidence=conf, block_size=args.block,
+                                         min_trees=args.min_trees)
+        t0 = time.perf_counter()
+        labels, _, used = run(X)
+        batch = time.perf_counter() - t0
+        row = per_row_latency(run, X, args.rows)
+        agree = float((labels == full).mean())
+        acc = float((labels == y.to_numpy()).mean())
+        saved = 1 - row / full_row if full_row else 0.0
+        print(f"{conf:>7} {agree:>8.4f} {acc:>9.4f} {used.mean():>11.1f} {np.percentile(used, 95):>10.0f} "
+              f"{batch*1000:>9.1f} {row*1000:>8.2f} {saved:>7.1%}")
+
+if __name__ == "__main__":
+    here = Path(__file__).parent
+    p = argparse.ArgumentParser()
+    p.add_argument("--csv", default=str(here / "Crop_recommendation.csv"))
+    p.add_argument("--model", default=str(here / "crop_rf_pipeline.joblib"))
+    p.add_argument("--confidence", type=float, nargs="+", default=[0.9, 0.95, 0.99, 0.999])
+    p.add_argument("--block", type=int, default=DEFAULT_BLOCK)
+    p.add_argument("--min-trees", type=int, default=None, help="defaults to one block")
+    p.add_argument("--rows", type=int, default=200, help="rows used for per-request latency")
+    p.add_argument("--noise", type=float, default=0.1, help="perturbation, in feature std units")
+    p.add_argument("--sets", nargs="+", default=["train", "holdout", "perturbed"],
+                   choices=["train", "holdout", "perturbed"])
+    args = p.parse_args()
+
+    pipe = joblib.load(args.model)
+    (X_train, y_train), (X_test, y_test) = split_like_training(pd.read_csv(args.csv))
+    sets = {"train": (X_train, y_train), "holdout": (X_test, y_test),
+            "perturbed": (perturb(X_test, args.noise), y_test)}
+
+    n_trees = len(pipe.named_steps["clf"].estimators_)
+    print(f"Trees: {n_trees}  block: {args.block}  min trees: {args.min_trees or args.block}")
+    for name in args.sets:
+        evaluate(pipe, name, *sets[name], args)
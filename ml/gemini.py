@@ -1,9 +1,14 @@
 import os
 import sys
 import json
-from dotenv import load_dotenv
-import google.generativeai as genai
-from google.generativeai import GenerativeModel # Import GenerativeModel
+import telemetry
+
+tm = telemetry.get("gemini")
+
+with tm.phase("import"):
+    from dotenv import load_dotenv
+    import google.generativeai as genai
+    from google.generativeai import GenerativeModel # Import GenerativeModel
 
 # Load environment variables from .env file
 load_dotenv()
@@ -11,6 +16,7 @@ load_dotenv()
 # Read API key from .env using the specified variable name
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY") # Use GOOGLE_API_KEY as per example
 if not GOOGLE_API_KEY:
+    tm.count("missing_api_key")
     error_message = "❌ GOOGLE_API_KEY not found in .env file"
     print(json.dumps({"care_guide": "", "error": error_message})) # Output structured error to stdout
     print(error_message, file=sys.stderr) # Also print to stderr for robust error capturing
@@ -18,10 +24,12 @@ if not GOOGLE_API_KEY:
 
 # Configure Gemini client
 try:
-    genai.configure(api_key=GOOGLE_API_KEY)
-    # Instantiate the model using GenerativeModel directly
-    model = GenerativeModel('gemini-2.0-flash') # Using gemini-1.0-pro as it's more stable for text, or 'gemini-2.0-flash' if preferred
+    with tm.phase("configure"):
+        genai.configure(api_key=GOOGLE_API_KEY)
+        # Instantiate the model using GenerativeModel directly
+        model = GenerativeModel('gemini-2.0-flash') # Using gemini-1.0-pro as it's more stable for text, or 'gemini-2.0-flash' if preferred
 except Exception as e:
+    tm.count("init_error")
     error_message = f"❌ Failed to initialize Google AI model: {e}"
     print(json.dumps({"care_guide": "", "error": error_message})) # Output structured error to stdout
     print(error_message, file=sys.stderr) # Also print to stderr
@@ -80,19 +88,22 @@ def get_crop_care_guide(farming_data):
             "max_output_tokens": 1024, # Ensure enough tokens for a comprehensive guide
         }
         
-        response = model.generate_content(
-            contents=[{"role": "user", "parts": [{"text": prompt}]}],
-            generation_config=generation_config
-        )
+        with tm.phase("generate"):
+            response = model.generate_content(
+                contents=[{"role": "user", "parts": [{"text": prompt}]}],
+                generation_config=generation_config
+            )
         
         # Check for candidates and parts before accessing .text
         if response and response.candidates and response.candidates[0].content.parts:
             return {"care_guide": response.candidates[0].content.parts[0].text, "error": None}
         else:
+            tm.count("empty_response")
             error_message = "Gemini API returned no candidates or empty content."
             print(error_message, file=sys.stderr) # Print to stderr for visibility
             return {"care_guide": "", "error": error_message}
     except Exception as e:
+        tm.count("api_error")
         error_message = f"❌ Gemini API call failed during content generation: {e}"
         print(error_message, file=sys.stderr) # Print actual exception to stderr
         return {"care_guide": "", "error": error_message}
@@ -0,0 +1,291 @@
+# ml/job_queue.py
+# Local SQLite-backed job queue for image diagnosis (no external broker).
+# server.js submits jobs and polls for results; diagnosis_worker.py consumes them.
+#
+#   python job_queue.py submit <image_path>   -> {"job_id": ...}
+#   python job_queue.py poll <job_id>         -> {"status": ..., "attempts": ..., "position": ...}
+#   python job_queue.py result <job_id>       -> {"status": ..., "diagnosis": ..., "error": ...}
+#                                                (poll / result add worker_alive and
+#                                                oldest_queued_age_s while the job is pending)
+#   python job_queue.py stats                 -> queue depth, wait / service times
+#   python job_queue.py cleanup [--max-age S] -> remove orphaned files in uploads/
+#
+# Nothing is processed until a worker is running: python diagnosis_worker.py.
+# The worker holds an exclusive lock on <db>.worker.lock, so at most one runs
+# per queue; poll / result report worker_alive by probing that lock.
+import os, sys, json, time, uuid, sqlite3, argparse
+from pathlib import Path
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+ML_DIR = Path(__file__).parent
+DEFAULT_DB = ML_DIR / "diagnosis_jobs.sqlite3"
+UPLOAD_DIR = ML_DIR.parent / "uploads"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id           TEXT PRIMARY KEY,
+    payload      TEXT NOT NULL,
+    status       TEXT NOT NULL,          -- queued | running | done | failed
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    result       TEXT,
+    error        TEXT,
+    created_at   REAL NOT NULL,
+    available_at REAL NOT NULL,
+    started_at   REAL,
+    finished_at  REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, available_at);
+"""
+
+def worker_lock_path(db=DEFAULT_DB):
+    return Path(str(db) + ".worker.lock")
+
+def try_lock(path):
+    """
+    Take an exclusive lock on `path` without blocking. Returns the open file
+    (the lock is held while it stays open) or None if someone else holds it.
+    """
+    f = open(path, "a+")
+    try:
+        if fcntl:
+            # lockf, not flock: record locks belong to this process, so pool
+            # processes forked from the worker do not keep it alive after a crash
+            fcntl.lockf(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+def unlock(f):
+    if fcntl is None:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    f.close()
+
+def worker_alive(db=DEFAULT_DB):
+    """True if a diagnosis_worker.py holds this queue's lock (None if the lock file can't be opened)."""
+    try:
+        f = try_lock(worker_lock_path(db))
+    except OSError:
+        return None
+    if f is None:
+        return True
+    unlock(f)
+    return False
+
+class JobQueue:
+    def __init__(self, path=DEFAULT_DB, max_attempts=3, retry_delay=5.0):
+        self.path = str(path)
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        # autocommit mode; writes that must be atomic use BEGIN IMMEDIATE
+        self.db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    # ---------- producer side ----------
+    def submit(self, payload):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self.db.execute(
+            "INSERT INTO jobs (id, payload, status, max_attempts, created_at, available_at) "
+            "VALUES (?, ?, 'queued', ?, ?, ?)",
+            (job_id, json.dumps(payload), self.max_attempts, now, now))
+        return job_id
+
+    def get(self, job_id):
+        return self.db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+    def poll(self, job_id):
+        job = self.get(job_id)
+        if job is None:
+            return {"job_id": job_id, "status": "unknown"}
+        out = {"job_id": job_id, "status": job["status"], "attempts": job["attempts"]}
+        if job["status"] == "queued":
+            ahead = self.db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at < ?",
+                (job["created_at"],)).fetchone()[0]
+            out["position"] = ahead + 1
+        if job["status"] in ("queued", "running"):
+            out.update(self.health())
+        return out
+
+    def result(self, job_id):
+        job = self.get(job_id)
+        if job is None:
+            return {"job_id": job_id, "status": "unknown", "diagnosis": "", "error": "Unknown job id"}
+        out = {"job_id": job_id, "status": job["status"], "diagnosis": "", "error": job["error"]}
+        if job["result"]:
+            out.update(json.loads(job["result"]))
+        if job["status"] in ("queued", "running"):
+            out.update(self.health())
+        return out
+
+    def oldest_queued_age(self):
+        oldest = self.db.execute(
+            "SELECT MIN(created_at) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        return round(time.time() - oldest, 3) if oldest else 0.0
+
+    def health(self):
+        """Whether anything is draining the queue, so clients can tell a stalled job from a slow one."""
+        return {"worker_alive": worker_alive(self.path), "oldest_queued_age_s": self.oldest_queued_age()}
+
+    # ---------- consumer side ----------
+    def claim(self):
+        """Atomically move the oldest available queued job to running. Returns a Row or None."""
+        now = time.time()
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            job = self.db.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' AND available_at <= ? "
+                "ORDER BY created_at LIMIT 1", (now,)).fetchone()
+            if job is not None:
+                self.db.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ? "
+                    "WHERE id = ?", (now, job["id"]))
+            self.db.execute("COMMIT")
+        except Exception:
+            self.db.execute("ROLLBACK")
+            raise
+        return job
+
+    def complete(self, job_id, result):
+        self.db.execute(
+            "UPDATE jobs SET status = 'done', result = ?, error = NULL, finished_at = ? WHERE id = ?",
+            (json.dumps(result), time.time(), job_id))
+
+    def fail(self, job_id, error):
+        """Record a failed attempt; requeue with linear backoff until max_attempts is reached."""
+        job = self.get(job_id)
+        now = time.time()
+        if job["attempts"] < job["max_attempts"]:
+            self.db.execute(
+                "UPDATE jobs SET status = 'queued', error = ?, available_at = ? WHERE id = ?",
+                (error, now + self.retry_delay * job["attempts"], job_id))
+            return "queued"
+        self.db.execute(
+            "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+            (error, now, job_id))
+        return "failed"
+
+    def release(self, job_id):
+        """Return a claimed job that never started to the queue without charging an attempt."""
+        self.db.execute(
+            "UPDATE jobs SET status = 'queued', attempts = MAX(attempts - 1, 0), started_at = NULL "
+            "WHERE id = ? AND status = 'running'", (job_id,))
+
+    def requeue_stale(self, lease_seconds):
+        """
+        Put jobs left running by a crashed worker back in the queue, or fail them
+        if they have used up max_attempts (e.g. a job that keeps killing the worker).
+        Returns (requeued, failed).
+        """
+        now = time.time()
+        cutoff = now - lease_seconds
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            failed = self.db.execute(
+                "UPDATE jobs SET status = 'failed', finished_at = ?, "
+                "error = 'Worker died while running the job' "
+                "WHERE status = 'running' AND started_at < ? AND attempts >= max_attempts",
+                (now, cutoff)).rowcount
+            requeued = self.db.execute(
+                "UPDATE jobs SET status = 'queued', available_at = ? "
+                "WHERE status = 'running' AND started_at < ?",
+                (now, cutoff)).rowcount
+            self.db.execute("COMMIT")
+        except Exception:
+            self.db.execute("ROLLBACK")
+            raise
+        return requeued, failed
+
+    # ---------- housekeeping ----------
+    def active_paths(self):
+        rows = self.db.execute("SELECT payload FROM jobs WHERE status IN ('queued', 'running')")
+        return {str(Path(json.loads(r["payload"]).get("image_path", "")).resolve()) for r in rows}
+
+    def cleanup_uploads(self, upload_dir=UPLOAD_DIR, max_age=3600):
+        """Delete files in uploads/ older than max_age seconds that no pending job references."""
+        upload_dir = Path(upload_dir)
+        if not upload_dir.is_dir():
+            return []
+        keep = self.active_paths()
+        cutoff = time.time() - max_age
+        removed = []
+        for f in upload_dir.iterdir():
+            if f.is_file() and f.stat().st_mtime < cutoff and str(f.resolve()) not in keep:
+                try:
+                    f.unlink()
+                    removed.append(f.name)
+                except OSError as e:
+                    print(f"cleanup: could not remove {f}: {e}", file=sys.stderr)
+        return removed
+
+    def stats(self, window=500):
+        """Queue depth plus wait (queued -> started) and service (started -> finished) times."""
+        counts = {r["status"]: r["n"] for r in self.db.execute(
+            "SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")}
+        rows = self.db.execute(
+            "SELECT created_at, started_at, finished_at FROM jobs "
+            "WHERE finished_at IS NOT NULL ORDER BY finished_at DESC LIMIT ?", (window,)).fetchall()
+        return {
+            "depth": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            **self.health(),
+            "wait_s": summarize([r["started_at"] - r["created_at"] for r in rows]),
+            "service_s": summarize([r["finished_at"] - r["started_at"] for r in rows]),
+        }
+
+def summarize(values):
+    if not values:
+        return {"count": 0}
+    v = sorted(values)
+    pick = lambda q: v[min(len(v) - 1, int(q * len(v)))]
+    return {"count": len(v), "mean": round(sum(v) / len(v), 3),
+            "p50": round(pick(0.5), 3), "p95": round(pick(0.95), 3), "max": round(v[-1], 3)}
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--db", default=str(DEFAULT_DB))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("submit"); p.add_argument("image_path")
+    p.add_argument("--max-attempts", type=int, default=3)
+    p = sub.add_parser("poll"); p.add_argument("job_id")
+    p = sub.add_parser("result"); p.add_argument("job_id")
+    sub.add_parser("stats")
+    p = sub.add_parser("cleanup"); p.add_argument("--max-age", type=float, default=3600)
+    p.add_argument("--uploads", default=str(UPLOAD_DIR))
+    args = ap.parse_args()
+
+    if args.cmd == "submit":
+        if not os.path.exists(args.image_path):
+            print(json.dumps({"job_id": None, "error": f"Image file not found: {args.image_path}"}))
+            sys.exit(1)
+        q = JobQueue(args.db, max_attempts=args.max_attempts)
+        out = {"job_id": q.submit({"image_path": str(Path(args.image_path).resolve())})}
+    else:
+        q = JobQueue(args.db)
+        if args.cmd == "poll":
+            out = q.poll(args.job_id)
+        elif args.cmd == "result":
+            out = q.result(args.job_id)
+        elif args.cmd == "stats":
+            out = q.stats()
+        else:
+            out = {"removed": q.cleanup_uploads(args.uploads, args.max_age)}
+    q.close()
+    print(json.dumps(out))
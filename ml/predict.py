@@ -1,28 +1,71 @@
 import sys, json
 from pathlib import Path
 import joblib, pandas as pd
+from adaptive_forest import predict_adaptive, DEFAULT_CONFIDENCE
+import telemetry
+
+tm = telemetry.get("predict")
+
+USAGE = "usage: predict.py N P K temperature humidity ph rainfall [--adaptive [--confidence C]]"
+
+def parse_args(argv):
+    """Split optional flags from the 7 positional readings. Raises ValueError on bad flags."""
+    opts = {"adaptive": False, "confidence": DEFAULT_CONFIDENCE}
+    vals = []
+    i = 0
+    while i < len(argv):
+        a = argv[i]
+        if a == "--adaptive":
+            opts["adaptive"] = True
+        elif a == "--confidence" and i + 1 < len(argv):
+            opts["confidence"] = float(argv[i + 1])
+            if not 0 < opts["confidence"] < 1:
+                raise ValueError("--confidence must be between 0 and 1 (exclusive)")
+            i += 1
+        else:
+            vals.append(a)
+        i += 1
+    return vals, opts
 
 def main():
-    if len(sys.argv) != 8:
-        print(json.dumps({"error":"usage: predict.py N P K temperature humidity ph rainfall"}))
+    try:
+        args, opts = parse_args(sys.argv[1:])
+    except ValueError as e:
+        tm.count("usage_error")
+        print(json.dumps({"error": f"{e}; {USAGE}"}))
+        return
+    if len(args) != 7:
+        tm.count("usage_error")
+        print(json.dumps({"error": USAGE}))
         return
 
-    vals = list(map(float, sys.argv[1:]))
+    vals = list(map(float, args))
 
     model_path = Path(__file__).with_name("crop_rf_pipeline.joblib")
     if not model_path.exists():
+        tm.count("model_missing")
         print(json.dumps({"error": f"model not found at {model_path}"}))
         return
 
-    pipe = joblib.load(model_path)
+    with tm.phase("load_model"):
+        pipe = joblib.load(model_path)
     cols = ["N","P","K","temperature","humidity","ph","rainfall"]
-    X = pd.DataFrame([dict(zip(cols, vals))])
+    row = dict(zip(cols, vals))
+    tm.observe_features(row)
+    X = pd.DataFrame([row])
 
-    pred = pipe.predict(X)[0]
+    trees_used = None
+    with tm.phase("predict"):
+        if opts["adaptive"]:
+            labels, proba, used = predict_adaptive(pipe, X, confidence=opts["confidence"])
+            pred, trees_used = labels[0], int(used[0])
+        else:
+            pred = pipe.predict(X)[0]
 
     # try to get top3
     try:
-        probs = pipe.predict_proba(X)[0]
+        with tm.phase("predict_proba"):
+            probs = proba[0] if opts["adaptive"] else pipe.predict_proba(X)[0]
         classes = pipe.named_steps["clf"].classes_
         topk_idx = probs.argsort()[-3:][::-1]
         top3 = [classes[i] for i in topk_idx]
@@ -35,6 +78,8 @@ def main():
         "message": f"The most suitable crop is {pred}",
         "alternatives": top3[1:] if len(top3) > 1 else []
     }
+    if trees_used is not None:
+        result["trees_used"] = trees_used
 
     print(json.dumps(result))
 
@@ -2,6 +2,11 @@ import sys, json, joblib, argparse
 from pathlib import Path
 import numpy as np
 import pandas as pd
+import telemetry
+from stage_rules import find_stage, GENERIC_RANGES
+from counterfactual import counterfactuals
+
+tm = telemetry.get("process_predict")
 
 # ---------- Simple, farmer-friendly advice templates ----------
 # Keep it short. You can edit any text below.
@@ -69,21 +74,6 @@ def build_advice(flags):
     # Advice: - point1\n- point2 ...
     return "\n".join(f"- {t}" for t in uniq)
 
-# ---------- Helpers for case-insensitive lookup + stage aliases ----------
-def normalize(s):
-    return str(s).strip().lower()
-
-STAGE_ALIASES = {
-    "land_prep": "preplant",
-    "soil_management": "preplant",
-    "planting": "planting",
-    "irrigation": "vegetative",
-    "weed_control": "vegetative",
-    "pest_management": "vegetative",
-    "fertilization": "vegetative",
-    "harvest": "harvest",
-}
-
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("crop")
@@ -98,13 +88,16 @@ def main():
     ap.add_argument("--rules", default="all_crops_stage_guide.json")
     ap.add_argument("--model", default="process_eval_pipeline.joblib")
     ap.add_argument("--threshold", type=float, default=0.4)  # tune if needed
+    ap.add_argument("--steps", type=int, default=3)  # counterfactual grid points per range
+    ap.add_argument("--no-counterfactual", action="store_true")
     args = ap.parse_args()
 
     # Load model
-    pipe = joblib.load(args.model)
+    with tm.phase("load_model"):
+        pipe = joblib.load(args.model)
 
     # Load rules/ranges
-    with open(args.rules, "r", encoding="utf-8") as f:
+    with tm.phase("load_rules"), open(args.rules, "r", encoding="utf-8") as f:
         rules = json.load(f)
 
     # Assemble input row
@@ -115,29 +108,21 @@ def main():
         "temperature": args.temperature, "humidity": args.humidity,
         "ph": args.ph, "rainfall": args.rainfall
     }
+    tm.observe_features(row)
     X = pd.DataFrame([row])
 
     # Predict suitability probability
-    proba = pipe.predict_proba(X)[:, 1][0]
+    with tm.phase("predict"):
+        proba = pipe.predict_proba(X)[:, 1][0]
     pred = int(proba >= args.threshold)
 
     # ---- Case-insensitive crop/stage lookup + aliases (robust flags) ----
-    crop_key = normalize(args.crop)
-    stage_key = normalize(STAGE_ALIASES.get(normalize(args.stage), args.stage))
-
-    crops_dict = rules.get("crops", {})
-    ci_crops = { normalize(k): v for k, v in crops_dict.items() }
-    c = ci_crops.get(crop_key, {})
-
-    st = None
-    for s in c.get("stages", []):
-        if normalize(s.get("stage")) == stage_key:
-            st = s
-            break
+    st = find_stage(rules, args.crop, args.stage)
 
     keys = ["N","P","K","temperature","humidity","ph","rainfall"]
 
     if st and "ideal_ranges" in st:
+        tm.count("stage_rules_hit")
         flags = {}
         for k in keys:
             rr = st["ideal_ranges"][k]
@@ -145,15 +130,11 @@ def main():
             flags[k] = "ok" if (rr["min"] <= v <= rr["max"]) else ("low" if v < rr["min"] else "high")
     else:
         # Generic fallback so farmers still get useful tips even if rules miss
-        GENERIC = {
-            "N": {"min":80,"max":120}, "P":{"min":40,"max":60}, "K":{"min":40,"max":60},
-            "ph":{"min":6.0,"max":7.0}, "temperature":{"min":18,"max":30},
-            "humidity":{"min":50,"max":80}, "rainfall":{"min":50,"max":250}
-        }
+        tm.count("generic_fallback")
         flags = {}
         for k in keys:
             v = row[k]
-            rr = GENERIC[k]
+            rr = GENERIC_RANGES[k]
             flags[k] = "ok" if (rr["min"] <= v <= rr["max"]) else ("low" if v < rr["min"] else "high")
 
     # --- Farmer-friendly advice (bullet points) ---
@@ -166,6 +147,12 @@ def main():
         "flags": flags,
         "advice": advice
     }
+
+    # --- Smallest change to the controllable inputs that makes it suitable ---
+    if pred == 0 and not args.no_counterfactual:
+        with tm.phase("counterfactual"):
+            out["counterfactual"] = counterfactuals(pipe, rules, [row], args.threshold, args.steps)[0]
+
     print(json.dumps(out))
 
 if __name__ == "__main__":
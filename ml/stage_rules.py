@@ -0,0 +1,39 @@
+# ml/stage_rules.py
+# Crop/stage lookup into all_crops_stage_guide.json, shared by process_predict.py
+# and counterfactual.py.
+
+# ---------- Helpers for case-insensitive lookup + stage aliases ----------
+def normalize(s):
+    return str(s).strip().lower()
+
+STAGE_ALIASES = {
+    "land_prep": "preplant",
+    "soil_management": "preplant",
+    "planting": "planting",
+    "irrigation": "vegetative",
+    "weed_control": "vegetative",
+    "pest_management": "vegetative",
+    "fertilization": "vegetative",
+    "harvest": "harvest",
+}
+
+# Generic fallback ranges when the guide has no entry for the crop/stage
+GENERIC_RANGES = {
+    "N": {"min":80,"max":120}, "P":{"min":40,"max":60}, "K":{"min":40,"max":60},
+    "ph":{"min":6.0,"max":7.0}, "temperature":{"min":18,"max":30},
+    "humidity":{"min":50,"max":80}, "rainfall":{"min":50,"max":250}
+}
+
+def find_stage(rules, crop, stage):
+    """Return the guide's stage entry for crop/stage (case-insensitive, aliased) or None."""
+    crop_key = normalize(crop)
+    stage_key = normalize(STAGE_ALIASES.get(normalize(stage), stage))
+
+    crops_dict = rules.get("crops", {})
+    ci_crops = { normalize(k): v for k, v in crops_dict.items() }
+    c = ci_crops.get(crop_key, {})
+
+    for s in c.get("stages", []):
+        if normalize(s.get("stage")) == stage_key:
+            return s
+    return None
@@ -0,0 +1,263 @@
+# ml/telemetry.py
+# Low-overhead inference telemetry for the ml/ scripts (stdlib only).
+#
+#   tm = telemetry.get("predict")
+#   with tm.phase("predict"): ...          # log2 latency histogram per phase
+#   tm.observe_features(row)               # raw readings of the 7 inputs
+#   tm.count("generic_fallback")           # plain counters
+#
+# Writers never take a lock: each thread increments its own shard, and feature
+# rows go into a thread-safe deque. flush() emits the delta since the previous
+# flush as one compact JSON line appended to TELEMETRY_FILE (at exit, or every
+# N seconds with start_periodic). A script spawned per request writes its few
+# rows raw; a long-running process folds them into per-feature KLL quantile
+# sketches (quantile_sketch.py) at each flush, off the request path, so lines
+# stay small. Writers only fold inline if DRAIN_AT rows pile up unflushed. The
+# file is rotated to TELEMETRY_FILE.1 once it passes MAX_BYTES, so at most two
+# files are kept. Reading the snapshots back (report / serve, drift against
+# Crop_recommendation.csv) lives in telemetry_report.py.
+#
+# Cost model: server.js spawns the instrumented scripts once per HTTP request,
+# so each request pays the recording calls (a few microseconds) plus importing
+# this module and one flush (open + append) at exit. This module therefore only
+# holds the recording side and reads nothing from disk; bench_telemetry.py
+# gates the recording, folding and per-spawn costs.
+#
+# Set MKULIMA_TELEMETRY=0 to disable, MKULIMA_TELEMETRY_FILE to move the output,
+# MKULIMA_TELEMETRY_MAX_BYTES to change the rotation size.
+import os, sys, json, time, atexit, threading
+from collections import deque
+from operator import add, itemgetter
+
+# Plain os.path strings: building pathlib.Path objects was a measurable share
+# of the import cost every spawned script pays
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+TELEMETRY_FILE = os.getenv("MKULIMA_TELEMETRY_FILE", os.path.join(ML_DIR, "telemetry.jsonl"))
+MAX_BYTES = int(os.getenv("MKULIMA_TELEMETRY_MAX_BYTES", 4 * 1024 * 1024))
+SNAPSHOT_VERSION = 1    # "v" on every line; telemetry_report skips lines with any other version
+ENABLED = os.getenv("MKULIMA_TELEMETRY", "1").lower() not in ("0", "off", "false", "no")
+
+FEATURES = ["N","P","K","temperature","humidity","ph","rainfall"]
+N_BUCKETS = 32          # bucket i holds latencies in [2^(i-1), 2^i) microseconds
+_RAW_SLOTS = 64         # recorders index by bit_length unclamped; totals() folds the tail
+DRAIN_AT = 16384        # unflushed rows before a writer folds them into the sketches itself
+RAW_ROWS_MAX = 64       # up to this many unsketched rows are written raw at flush
+
+_perf_ns = time.perf_counter_ns
+_pick_features = itemgetter(*FEATURES)
+
+# ---------- Recording ----------
+class _Phase:
+    # Telemetry.phase() stores t0 just before the `with` block starts, so
+    # __enter__ can be a C builtin rather than a Python call. `as` binds an int.
+    __slots__ = ("acc", "t0")
+    __enter__ = staticmethod(_perf_ns)
+
+    def __init__(self, acc):
+        self.acc = acc
+
+    def __exit__(self, et, ev, tb):
+        # Same bucketing as Telemetry.record, inlined to keep the context manager cheap
+        ns = _perf_ns() - self.t0
+        acc = self.acc
+        acc[(ns // 1000).bit_length()] += 1
+        acc[-1] += ns
+
+# Shared by disabled Telemetry objects: the same cheap path, into a scratch
+# accumulator nothing reads
+_NULL_PHASE = _Phase([0] * (_RAW_SLOTS + 1))
+
+class _Local(threading.local):
+    """
+    One thread's counters (threading.local re-runs __init__ in every new
+    thread). Only the owning thread writes; flush() only reads.
+    """
+    def __init__(self, register):
+        self.lat = {}         # phase -> [bucket counts..., total ns]
+        self.phases = {}      # phase -> reusable _Phase (phases of one name don't nest)
+        self.count = {}
+        register(self.lat, self.count)
+
+class Telemetry:
+    def __init__(self, script, path=TELEMETRY_FILE, enabled=ENABLED, max_bytes=MAX_BYTES):
+        self.script = script
+        self.path = os.fspath(path)
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self._shards = []           # (lat, count) appended once per thread; only read by flush()
+        self._shards_lock = threading.Lock()
+        self._local = _Local(self._register)
+        self._last = {}             # cumulative totals at the previous flush
+        self._rows = deque()        # feature tuples (FEATURES order) not yet sketched
+        self._sketches = {}         # feature -> QuantileSketch since the previous flush
+        self._sketch_lock = threading.Lock()  # taken once per DRAIN_AT rows and at flush
+
+    def _register(self, lat, count):
+        with self._shards_lock:  # once per thread, never on the hot path
+            self._shards.append((lat, count))
+
+    def _acc(self, name):
+        lat = self._local.lat
+        acc = lat.get(name)
+        if acc is None:
+            acc = lat[name] = [0] * _RAW_SLOTS + [0]  # buckets..., total ns
+        return acc
+
+    def phase(self, name):
+        """Context manager timing one phase into the `name` histogram."""
+        try:
+            p = self._local.phases[name]
+        except KeyError:
+            p = self._local.phases[name] = _Phase(self._acc(name)) if self.enabled else _NULL_PHASE
+        p.t0 = _perf_ns()
+        return p
+
+    def record(self, name, seconds):
+        if not self.enabled:
+            return
+        acc = self._acc(name)
+        ns = max(int(seconds * 1e9), 0)
+        acc[min((ns // 1000).bit_length(), _RAW_SLOTS - 1)] += 1
+        acc[-1] += ns
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        c = self._local.count
+        c[name] = c.get(name, 0) + n
+
+    def observe_features(self, row):
+        """row: mapping with the 7 numeric inputs (missing/non-numeric values are skipped)."""
+        if not self.enabled:
+            return
+        try:
+            vals = _pick_features(row)
+        except KeyError:
+            vals = tuple(map(row.get, FEATURES))
+        rows = self._rows
+        rows.append(vals)  # deque.append is thread-safe, so writers need no lock
+        if len(rows) >= DRAIN_AT:
+            self.drain()
+
+    def _take(self):
+        """Remove and return the buffered rows (caller holds _sketch_lock)."""
+        rows = self._rows
+        return [rows.popleft() for _ in range(len(rows))]  # rows appended meanwhile stay
+
+    def drain(self):
+        """Fold buffered rows into the per-feature sketches (flush() does this off the request path)."""
+        from quantile_sketch import QuantileSketch  # never reached by scripts spawned per request
+        with self._sketch_lock:
+            data = self._take()
+            if not data:
+                return
+            for k, col in zip(FEATURES, zip(*data)):
+                sk = self._sketches.get(k)
+                if sk is None:
+                    sk = self._sketches[k] = QuantileSketch()
+                sk.update(col)
+
+    # ---------- Export ----------
+    def totals(self):
+        """Cumulative latency and counter totals across thread shards (read-only)."""
+        out = {"lat": {}, "sum": {}, "count": {}}  # sum: total ns per phase
+        for lat, count in list(self._shards):
+            for name, arr in list(lat.items()):
+                arr = list(arr)
+                buckets = arr[:N_BUCKETS]
+                buckets[-1] += sum(arr[N_BUCKETS:_RAW_SLOTS])  # the last bucket is open-ended
+                prev = out["lat"].get(name)
+                out["lat"][name] = list(map(add, prev, buckets)) if prev else buckets
+                out["sum"][name] = out["sum"].get(name, 0) + arr[-1]
+            for name, v in list(count.items()):
+                out["count"][name] = out["count"].get(name, 0) + v
+        return out
+
+    def snapshot(self):
+        """
+        Delta since the previous snapshot. Latency histograms are sparse
+        {bucket: count}. Feature readings seen since then are in "feat" (one
+        quantile sketch per feature) and/or "rows" (raw rows in FEATURES
+        order, at most RAW_ROWS_MAX). Empty sections are dropped.
+        """
+        now = self.totals()
+        last, self._last = self._last, now
+        delta = {}
+        for name, arr in now["lat"].items():
+            prev = last.get("lat", {}).get(name, [0] * len(arr))
+            d = {str(i): a - b for i, (a, b) in enumerate(zip(arr, prev)) if a != b}
+            if d:
+                delta.setdefault("lat", {})[name] = d
+        for kind in ("sum", "count"):
+            for name, v in now[kind].items():
+                d = v - last.get(kind, {}).get(name, 0)
+                if d:
+                    delta.setdefault(kind, {})[name] = d
+        if len(self._rows) > RAW_ROWS_MAX:
+            self.drain()
+        with self._sketch_lock:
+            sketches, self._sketches = self._sketches, {}
+            data = self._take()
+        feat = {k: sk.to_json() for k, sk in sketches.items() if sk.n}
+        if feat:
+            delta["feat"] = feat
+        if data:
+            delta["rows"] = data
+        return delta
+
+    def flush(self):
+        if not self.enabled:
+            return
+        delta = self.snapshot()
+        if not delta:
+            return
+        line = json.dumps({"v": SNAPSHOT_VERSION, "ts": round(time.time(), 3), "script": self.script,
+                           "pid": os.getpid(), **delta}, separators=(",", ":")) + "\n"
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode("utf-8"))
+                size = os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+            if size > self.max_bytes:
+                rotate(self.path, self.max_bytes)
+        except OSError as e:
+            print(f"telemetry: could not write {self.path}: {e}", file=sys.stderr)
+
+    def start_periodic(self, interval=60.0):
+        """Flush every `interval` seconds from a daemon thread (for long-running processes)."""
+        def loop():
+            while True:
+                time.sleep(interval)
+                self.flush()
+        if self.enabled:
+            threading.Thread(target=loop, name="telemetry-flush", daemon=True).start()
+
+def rotate(path, max_bytes):
+    """Move path to path.1 (replacing the previous one) if it is still over max_bytes."""
+    path = os.fspath(path)
+    try:
+        if os.stat(path).st_size > max_bytes:  # re-check: another process may have rotated
+            os.replace(path, path + ".1")
+    except OSError:
+        pass
+
+_registry = {}
+
+def _at_exit(tm, t0):
+    tm.record("total", (_perf_ns() - t0) / 1e9)
+    tm.flush()
+
+def get(script):
+    """
+    Process-wide Telemetry for `script`, flushed automatically at exit.
+    The "total" phase (from this call to exit) is recorded at the same time,
+    so scripts don't wrap main() in a phase of their own.
+    """
+    tm = _registry.get(script)
+    if tm is None:
+        tm = _registry[script] = Telemetry(script)
+        atexit.register(_at_exit, tm, _perf_ns())
+    return tm
+
@@ -0,0 +1,228 @@
+# ml/telemetry_report.py
+# Reads the snapshots telemetry.py appends and summarizes them: latency
+# quantiles per phase, counters, and per-feature drift of live inputs against
+# Crop_recommendation.csv (PSI on training ventiles, share outside the training
+# range, live vs training p10/p50/p90). Kept out of telemetry.py so scripts
+# spawned per request never load it.
+#
+#   python telemetry_report.py report [--window S]   -> JSON summary on stdout
+#   python telemetry_report.py serve [--port 9109]   -> same summary over HTTP
+import os, csv, json, math, time, argparse
+from bisect import bisect_right
+from quantile_sketch import QuantileSketch
+from telemetry import ML_DIR, TELEMETRY_FILE, FEATURES, N_BUCKETS, SNAPSHOT_VERSION
+
+BASELINE_CSV = os.path.join(ML_DIR, "Crop_recommendation.csv")
+BASELINE_CACHE = os.path.join(ML_DIR, "telemetry_baseline.json")
+BASELINE_VERSION = 3
+N_FEATURE_BINS = 20     # training ventiles, used for PSI
+
+# ---------- Training distribution ----------
+def load_baseline(csv_path=BASELINE_CSV, cache_path=BASELINE_CACHE):
+    """
+    Per-feature training bins and quantiles, cached as JSON.
+
+    edges = [train min] + training ventiles + [just above train max], so bin 0
+    holds values below the training range and the last bin values above it.
+    """
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            base = json.load(f)
+        if base.pop("version", None) == BASELINE_VERSION:
+            return base
+    except (OSError, ValueError):
+        pass
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    base = {}
+    for k in FEATURES:
+        vals = sorted(float(r[k]) for r in rows)
+        inner = {vals[int(len(vals) * i / N_FEATURE_BINS)] for i in range(1, N_FEATURE_BINS)}
+        edges = sorted(inner | {vals[0]}) + [math.nextafter(vals[-1], math.inf)]
+        counts = [0] * (len(edges) + 1)
+        for v in vals:
+            counts[bisect_right(edges, v)] += 1
+        # Same rule as QuantileSketch.quantile, so live and training values compare directly
+        quantiles = {f"p{int(q * 100)}": vals[max(math.ceil(q * len(vals)) - 1, 0)]
+                     for q in (0.1, 0.5, 0.9)}
+        base[k] = {"edges": edges, "counts": counts, "quantiles": quantiles,
+                   "min": vals[0], "max": vals[-1]}
+    try:
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump({"version": BASELINE_VERSION, **base}, f)
+    except OSError:
+        pass
+    return base
+
+# ---------- Reporting ----------
+def bucket_quantile(buckets, q):
+    """Approximate quantile (seconds) from a log2 histogram, interpolating inside the bucket."""
+    total = sum(buckets)
+    if not total:
+        return None
+    target, seen = q * total, 0
+    for i, c in enumerate(buckets):
+        if c and seen + c >= target:
+            lo, hi = (2 ** (i - 1) if i else 0), 2 ** i
+            return (lo + (hi - lo) * (target - seen) / c) / 1e6
+        seen += c
+    return 2 ** (len(buckets) - 1) / 1e6
+
+def psi(live, train, eps=1e-4):
+    """Population stability index of live bin counts against training bin counts."""
+    n_live, n_train = sum(live), sum(train)
+    out = 0.0
+    for a, b in zip(live, train):
+        p, q = max(a / n_live, eps), max(b / n_train, eps)
+        out += (p - q) * math.log(p / q)
+    return out
+
+def read_snapshots(path=TELEMETRY_FILE, window=None):
+    """
+    Raw snapshot lines from the rotated and current files (each bounded by
+    MAX_BYTES). Lines that aren't JSON objects are yielded as None so the
+    caller can count them.
+    """
+    cutoff = time.time() - window if window else 0
+    path = os.fspath(path)
+    for p in (path + ".1", path):
+        try:
+            with open(p, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        snap = json.loads(line)
+                    except ValueError:
+                        snap = None
+                    if not isinstance(snap, dict):
+                        yield None
+                    elif not isinstance(snap.get("ts"), (int, float)) or snap["ts"] >= cutoff:
+                        yield snap
+        except OSError:
+            continue
+
+def parse_snapshot(snap):
+    """
+    Validate one snapshot line and convert it to merge-ready form: sketches
+    in "feat", raw readings as one list per feature in "cols".
+    Raises ValueError, TypeError, KeyError or AttributeError if it can't be merged.
+    """
+    if snap.get("v") != SNAPSHOT_VERSION:
+        raise ValueError(f"unsupported snapshot version {snap.get('v')!r}")
+    out = {"script": str(snap["script"]), "lat": {}, "sum": {}, "count": {}, "feat": {}}
+    for name, sparse in snap.get("lat", {}).items():
+        buckets = {int(i): int(c) for i, c in sparse.items()}
+        if any(not 0 <= i < N_BUCKETS for i in buckets):
+            raise ValueError(f"latency bucket out of range in {name!r}")
+        out["lat"][name] = buckets
+    for kind in ("sum", "count"):
+        out[kind] = {name: int(v) for name, v in snap.get(kind, {}).items()}
+    for name, sk in snap.get("feat", {}).items():
+        out["feat"][name] = QuantileSketch.from_json(sk)
+    out["cols"] = cols = [[] for _ in FEATURES]
+    for row in snap.get("rows", []):
+        if len(row) != len(FEATURES):
+            raise ValueError(f"feature row has {len(row)} values, expected {len(FEATURES)}")
+        for col, v in zip(cols, row):
+            if v is not None:
+                col.append(float(v))
+    return out
+
+def report(path=TELEMETRY_FILE, window=None):
+    """Merge snapshots (optionally only the last `window` seconds) into per-script summaries."""
+    merged, skipped = {}, 0
+    for snap in read_snapshots(path, window):
+        try:
+            s = parse_snapshot(snap)
+        except (ValueError, TypeError, KeyError, AttributeError):
+            skipped += 1  # corrupt line or an older / newer snapshot format
+            continue
+        m = merged.setdefault(s["script"], {"lat": {}, "sum": {}, "feat": {}, "count": {},
+                                            "cols": [[] for _ in FEATURES], "snapshots": 0})
+        m["snapshots"] += 1
+        for name, sparse in s["lat"].items():
+            acc = m["lat"].setdefault(name, {})
+            for i, c in sparse.items():
+                acc[i] = acc.get(i, 0) + c
+        for kind in ("sum", "count"):
+            for name, v in s[kind].items():
+                m[kind][name] = m[kind].get(name, 0) + v
+        for name, sk in s["feat"].items():
+            if name in m["feat"]:
+                m["feat"][name].merge(sk)
+            else:
+                m["feat"][name] = sk
+        for acc, col in zip(m["cols"], s["cols"]):
+            acc.extend(col)
+
+    baseline = None
+    out = {"generated_at": time.time(), "window_s": window, "skipped_lines": skipped, "scripts": {}}
+    for script, m in merged.items():
+        phases = {}
+        for name, sparse in m["lat"].items():
+            buckets = [sparse.get(i, 0) for i in range(N_BUCKETS)]
+            n = sum(buckets)
+            phases[name] = {
+                "count": n,
+                "mean_ms": round(m["sum"].get(name, 0) / n / 1e6, 3) if n else None,
+                **{f"p{int(q * 100)}_ms": round(bucket_quantile(buckets, q) * 1000, 3)
+                   for q in (0.5, 0.95, 0.99)},
+            }
+        for k, col in zip(FEATURES, m["cols"]):
+            if col:
+                m["feat"].setdefault(k, QuantileSketch()).update(col)
+        features = {}
+        if m["feat"]:
+            baseline = baseline or load_baseline()
+            for k, sk in m["feat"].items():
+                b = baseline.get(k)
+                n = sk.n
+                if not b or not n:
+                    continue
+                counts = sk.histogram(b["edges"])
+                features[k] = {
+                    "count": n,
+                    "psi": round(psi(counts, b["counts"]), 4),
+                    "below_train_min": round(counts[0] / n, 4),
+                    "above_train_max": round(counts[-1] / n, 4),
+                    "live_min": sk.lo,
+                    "live_max": sk.hi,
+                    **{f"p{int(q * 100)}": round(sk.quantile(q), 3) for q in (0.1, 0.5, 0.9)},
+                    **{f"train_{name}": v for name, v in b["quantiles"].items()},
+                }
+        out["scripts"][script] = {"snapshots": m["snapshots"], "phases": phases,
+                                  "features": features, "counters": m["count"]}
+    return out
+
+def serve(port, path, window):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = json.dumps(report(path, window)).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--file", default=str(TELEMETRY_FILE))
+    ap.add_argument("--window", type=float, default=None, help="only snapshots from the last N seconds")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("report")
+    p = sub.add_parser("serve"); p.add_argument("--port", type=int, default=9109)
+    args = ap.parse_args()
+
+    if args.cmd == "report":
+        print(json.dumps(report(args.file, args.window), indent=2))
+    else:
+        serve(args.port, args.file, args.window)
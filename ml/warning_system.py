@@ -2,12 +2,17 @@ import requests
 from geopy.geocoders import Nominatim
 import json
 import sys
+import telemetry
+
+tm = telemetry.get("warning_system")
 
 def get_forecast(location_name):
     try:
-        geolocator = Nominatim(user_agent="weather_app")
-        location = geolocator.geocode(location_name)
+        with tm.phase("geocode"):
+            geolocator = Nominatim(user_agent="weather_app")
+            location = geolocator.geocode(location_name)
         if not location:
+            tm.count("location_not_found")
             return {"error": "❌ Location not found"}
 
         latitude, longitude = location.latitude, location.longitude
@@ -20,7 +25,8 @@ def get_forecast(location_name):
             "&timezone=Africa%2FNairobi"
         )
 
-        response = requests.get(url)
+        with tm.phase("forecast_http"):
+            response = requests.get(url)
         response.raise_for_status()
         data = response.json()
 
@@ -32,10 +38,13 @@ def get_forecast(location_name):
         }
         
     except requests.exceptions.RequestException as e:
+        tm.count("request_error")
         return {"error": f"API request failed: {str(e)}"}
     except json.JSONDecodeError:
+        tm.count("bad_json")
         return {"error": "Failed to parse API response as JSON."}
     except Exception as e:
+        tm.count("unexpected_error")
         return {"error": f"An unexpected error occurred: {str(e)}"}
 
 if __name__ == "__main__":
@@ -763,6 +763,49 @@ app.post('/api/diagnose-image', upload.single('cropImage'), async (req, res) =>
 });
 
 
+// ---------------------------
+// Queued image diagnosis (ml/job_queue.py + ml/diagnosis_worker.py)
+// Submit returns a job id immediately; clients poll GET /api/diagnose-jobs/:id.
+// Jobs are only processed while `python ml/diagnosis_worker.py` runs (see README);
+// pending jobs report worker_alive and oldest_queued_age_s so a stalled queue shows.
+// ---------------------------
+function runJobQueue(args, cb) {
+  const pyCmd = process.platform === 'win32' ? 'python' : 'python3';
+  const pyPath = path.join(__dirname, 'ml', 'job_queue.py');
+  const py = spawn(pyCmd, [pyPath, ...args], { cwd: path.join(__dirname, 'ml') });
+
+  let out = '', err = '';
+  py.stdout.on('data', d => out += d.toString());
+  py.stderr.on('data', d => err += d.toString());
+  py.on('close', code => {
+    try { return cb(null, JSON.parse(out.trim()), code); }
+    catch { return cb(err || out || 'Non-JSON job queue output'); }
+  });
+}
+
+app.post('/api/diagnose-jobs', upload.single('image'), (req, res) => {
+  if (!req.file) return res.status(400).json({ message: 'No image uploaded (field: image)' });
+
+  runJobQueue(['submit', req.file.path], (error, parsed, code) => {
+    if (error || code !== 0 || !parsed?.job_id) {
+      return res.status(500).json({ message: 'Could not queue diagnosis', error: error || parsed?.error });
+    }
+    return res.status(202).json({ job_id: parsed.job_id, status: 'queued' });
+  });
+});
+
+app.get('/api/diagnose-jobs/:id', (req, res) => {
+  const id = String(req.params.id);
+  if (!/^[0-9a-f]{32}$/.test(id)) return res.status(400).json({ message: 'Bad job id' });
+
+  runJobQueue(['result', id], (error, parsed) => {
+    if (error) return res.status(500).json({ message: 'Job queue error', error });
+    if (parsed.status === 'unknown') return res.status(404).json(parsed);
+    if (parsed.worker_alive === false) console.warn('diagnose-jobs: no worker running (python ml/diagnosis_worker.py)');
+    return res.json(parsed);
+  });
+});
+
 app.all('/ussd', async (req, res) => {
   console.log('[USSD HIT]', {
     method: req.method,